@@ -1,7 +1,9 @@
 import logging
 import asyncio
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -11,10 +13,16 @@ from telegram.ext import (
 )
 import time
 import shutil
-from telegram.constants import ParseMode, ChatAction
+from telegram.constants import ParseMode, ChatAction, ChatType
 from bot import config
-from bot.database import Database, DownloadStatus
-from bot.download import download_video, is_valid_url, DownloadError, get_platform
+from bot.database import Database, DownloadStatus, RAW_RETENTION_DAYS
+from bot.download import download_video, probe_video, hash_file, is_valid_url, DownloadError, get_platform
+from bot.cookies import cookie_pool
+from bot.throttle import platform_limiter
+from bot.canonical import canonical_key, ShortLinkResolver
+from bot.logs import setup_logging, bind_log_context
+from bot.stream import STREAMING_ENABLED, StreamError, can_stream, stream_video
+from bot import transport
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 
@@ -27,6 +35,14 @@ user_download_counts = defaultdict(int)
 user_download_times = defaultdict(float)
 user_semaphores = defaultdict(lambda: asyncio.Semaphore(3))
 
+# Short link expansion for canonical keys (optional, does a network round-trip)
+short_links_config = config.short_links or {}
+short_link_resolver = ShortLinkResolver(
+    ttl=short_links_config.get("ttl", 24 * 60 * 60),
+    max_entries=short_links_config.get("max_entries", 10000),
+    timeout=short_links_config.get("timeout", 5)
+) if short_links_config.get("resolve") else None
+
 # Constants
 # Constants
 MAX_FILE_SIZE_MB = 4000
@@ -75,7 +91,8 @@ Simply send a video URL from YouTube, TikTok, or Instagram!
 Enjoy your video! 🎉""",
     "cancel_success": "🛑 Download cancelled successfully!",
     "no_active_download": "🤔 No active download to cancel.",
-    "too_large": "⚠️ Video is too large! Maximum size is {max_size}MB 📦"
+    "too_large": "⚠️ Video is too large! Maximum size is {max_size}MB 📦",
+    "admin_only": "⛔ This command is for admins only."
 }
 
 async def update_user_stats(user_id: int, chat_id: int, success: bool = True, platform: str = None):
@@ -83,28 +100,23 @@ async def update_user_stats(user_id: int, chat_id: int, success: bool = True, pl
     try:
         current_time = datetime.now(timezone.utc)
         
-        # Update user's main stats
-        update_dict = {
-            "last_interaction": current_time,
-            f"total_{platform}_downloads": 1 if success else 0
-        } if platform else {"last_interaction": current_time}
-        
-        inc_dict = {
-            "total_requests": 1,
-            "successful_downloads": 1 if success else 0,
-            "failed_downloads": 0 if success else 1
+        # Update user's main stats; last_interaction is left to register_user/touch_user
+        update = {
+            "$inc": {
+                "total_requests": 1,
+                "successful_downloads": 1 if success else 0,
+                "failed_downloads": 0 if success else 1
+            }
         }
+        if platform:
+            update["$set"] = {f"total_{platform}_downloads": 1 if success else 0}
 
-        db.user_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$set": update_dict,
-                "$inc": inc_dict
-            }
-        )
+        result = db.user_collection.update_one({"user_id": user_id}, update)
+        if not result.matched_count:
+            # The user document is gone; let the next touch_user recreate it
+            db.known_users.discard(user_id)
 
         # Update daily stats
-        today = datetime.combine(current_time.date(), datetime.min.time())
         daily_stats = {
             "daily_requests": 1,
             "successful_requests": 1 if success else 0,
@@ -113,20 +125,10 @@ async def update_user_stats(user_id: int, chat_id: int, success: bool = True, pl
         if platform:
             daily_stats[f"{platform}_downloads"] = 1 if success else 0
 
-        db.user_stats_collection.update_one(
-            {
-                "user_id": user_id,
-                "date": today
-            },
-            {
-                "$inc": daily_stats,
-                "$set": {"last_request_date": current_time}
-            },
-            upsert=True
-        )
+        db.increment_daily_stats(user_id, daily_stats, last_request=current_time)
 
     except Exception as e:
-        logger.error(f"Error updating user stats: {str(e)}", exc_info=True)
+        logger.error("Error updating user stats: %s", e, exc_info=True)
 
 async def get_user_stats(user_id: int) -> str:
     """Get formatted user statistics"""
@@ -137,17 +139,10 @@ async def get_user_stats(user_id: int) -> str:
             return "❌ User not found"
         
         # Get today's stats
-        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        today_stats = db.user_stats_collection.find_one({
-            "user_id": user_id,
-            "date": today_start
-        }) or {}
+        today_stats = db.get_today_stats(user_id)
         
         # Calculate total data downloaded
-        total_data = sum(
-            stats.get("total_data_downloaded", 0)
-            for stats in db.user_stats_collection.find({"user_id": user_id})
-        )
+        total_data = db.get_total_data_downloaded(user_id)
 
         return f"""📊 <b>Your Statistics</b>
 
@@ -200,6 +195,58 @@ async def stats_handle(update: Update, context: CallbackContext):
         logger.error(f"Error in stats_handle: {str(e)}", exc_info=True)
         await update.message.reply_text(MESSAGES["error"])
 
+def is_admin(user) -> bool:
+    """Check if user is listed in admin_usernames"""
+    return bool(user.username) and user.username in (config.admin_usernames or [])
+
+def get_service_status() -> str:
+    """Get formatted health of shared download resources"""
+    lines = ["🩺 <b>Service Status</b>", "", "🍪 <b>Cookie jars</b>"]
+    for platform, jars in cookie_pool.stats().items():
+        for jar in jars:
+            state = f"benched {jar['benched_for']}s" if jar["benched_for"] else "ok"
+            lines.append(
+                f"• {platform}/{jar['jar']}: {state}, in use {jar['in_use']}, "
+                f"✅ {jar['successes']} ❌ {jar['failures']}"
+            )
+    lines += ["", "🚦 <b>Platform concurrency</b>"]
+    for platform, limit in platform_limiter.stats().items():
+        lines.append(
+            f"• {platform}: limit {limit['limit']}, running {limit['in_flight']}, "
+            f"queued {limit['waiting']}, throttled {limit['throttled']}"
+        )
+    user_cache = db.known_users.stats()
+    lines += [
+        "",
+        "👤 <b>Known-user cache</b>",
+        f"• {user_cache['size']} users, hit rate {user_cache['hit_rate']:.1%}",
+        f"• Mongo calls per request: {user_cache['calls_per_request']:.2f} "
+        f"(uncached {user_cache['legacy_calls_per_request']:.2f}, "
+        f"saved {user_cache['calls_saved_per_request']:+.2f})"
+    ]
+    dedupe = db.get_dedupe_stats()
+    lines += [
+        "",
+        "♻️ <b>Content dedupe</b>",
+        f"• {dedupe['files']} known files, {dedupe['reused']} resent by file_id",
+        f"• saved {dedupe['saved_bytes'] / (1024 * 1024):.1f} MB and ~{dedupe['saved_seconds']:.0f}s of uploads"
+    ]
+    return "\n".join(lines)
+
+async def status_handle(update: Update, context: CallbackContext):
+    """Handle /status command (admins only)"""
+    try:
+        if not is_admin(update.message.from_user):
+            await update.message.reply_text(MESSAGES["admin_only"])
+            return
+        await update.message.reply_text(
+            get_service_status(),
+            parse_mode=ParseMode.HTML
+        )
+    except Exception as e:
+        logger.error(f"Error in status_handle: {str(e)}", exc_info=True)
+        await update.message.reply_text(MESSAGES["error"])
+
 async def cancel_handle(update: Update, context: CallbackContext):
     """Handle /cancel command"""
     try:
@@ -213,19 +260,20 @@ async def cancel_handle(update: Update, context: CallbackContext):
         logger.error(f"Error in cancel_handle: {str(e)}", exc_info=True)
         await update.message.reply_text(MESSAGES["error"])
 
-async def register_user(update: Update, context: CallbackContext, user):
-    """Register new user if not exists"""
+async def register_user(update: Update, context: CallbackContext, user,
+                        call_site: str = "start"):
+    """Register new user if not exists and refresh last_interaction"""
     try:
-        if not db.check_if_user_exists(user.id):
-            db.add_new_user(
-                user.id,
-                update.message.chat_id,
-                username=user.username,
-                first_name=user.first_name,
-                last_name=user.last_name
-            )
+        db.touch_user(
+            user.id,
+            update.message.chat_id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            call_site=call_site
+        )
     except Exception as e:
-        logger.error(f"Error registering user: {str(e)}", exc_info=True)
+        logger.error("Error registering user: %s", e, exc_info=True)
 
 async def check_rate_limit(user_id: int) -> bool:
     """Check if user has exceeded rate limit"""
@@ -240,12 +288,115 @@ async def check_rate_limit(user_id: int) -> bool:
     user_download_counts[user_id] += 1
     return True
 
+def too_large_error(file_size_limit: int, is_premium: bool) -> ValueError:
+    return ValueError(
+        f"⚠️ Video is too large! Maximum size is {file_size_limit}MB 📦\n"
+        f"{'Consider getting Telegram Premium to download larger files!' if not is_premium else ''}"
+    )
+
+def sent_file_id(message) -> Tuple[Optional[str], str]:
+    """Return (file_id, kind) of the media in a message the bot sent"""
+    for kind in ("video", "animation", "document"):
+        media = getattr(message, kind, None)
+        if media:
+            return media.file_id, kind
+    return None, "document"
+
+def reply_to_id(update: Update) -> Optional[int]:
+    """Message to quote when sending outside reply_* helpers (they quote in groups by default)"""
+    if update.message.chat.type == ChatType.PRIVATE:
+        return None
+    return update.message.message_id
+
+async def send_by_file_id(update: Update, file_id: str, kind: str, caption: str):
+    """Resend media already stored on Telegram"""
+    if kind == "video":
+        return await update.message.reply_video(video=file_id, caption=caption, supports_streaming=True)
+    if kind == "animation":
+        return await update.message.reply_animation(animation=file_id, caption=caption)
+    return await update.message.reply_document(document=file_id, caption=caption)
+
+async def resend_media_file(update: Update, media_file: Dict, caption: str,
+                            canonical_key: Optional[str] = None) -> bool:
+    """Resend a file uploaded before by its file_id; False if Telegram refused it"""
+    started = time.monotonic()
+    try:
+        await send_by_file_id(update, media_file["fid"], media_file["kind"], caption)
+    except TelegramError as e:
+        logger.warning("Resend by file_id failed, uploading again: %s", e)
+        return False
+    resend_seconds = time.monotonic() - started
+    db.record_media_reuse(
+        media_file["_id"],
+        media_file["sz"],
+        max(0.0, media_file.get("us", 0) - resend_seconds),
+        canonical_key=canonical_key
+    )
+    logger.info(f"Resent {media_file['_id'][:12]} by file_id, skipped uploading {media_file['sz']} bytes")
+    return True
+
+async def upload_from_disk(update: Update, context: CallbackContext, file_path: Path,
+                           file_size: int, file_size_limit: int, is_premium: bool,
+                           platform: str, status_message, canonical_key: str) -> str:
+    """Send a downloaded file as video, falling back to document; return its content hash.
+
+    Files whose bytes were uploaded before are resent by file_id instead.
+    """
+    if context.user_data.get('cancel_download'):
+        raise DownloadError("Download cancelled by user")
+
+    if not file_path.exists():
+        raise FileNotFoundError("File not found after download")
+
+    file_size_mb = file_size / (1024 * 1024)
+    if file_size_mb > file_size_limit:
+        raise too_large_error(file_size_limit, is_premium)
+
+    await status_message.edit_text(MESSAGES["upload_progress"])
+    caption = MESSAGES["success"].format(size=file_size_mb, platform=platform)
+
+    content_hash = await asyncio.to_thread(hash_file, str(file_path))
+    media_file = db.get_media_file(content_hash)
+    if media_file and await resend_media_file(update, media_file, caption, canonical_key):
+        return content_hash
+
+    started = time.monotonic()
+    # Large sends go through the upload transport so they don't hold control connections
+    with open(file_path, 'rb') as file:
+        try:
+            message = await transport.upload_bot.send_video(
+                chat_id=update.message.chat_id,
+                video=file,
+                caption=caption,
+                supports_streaming=True,
+                reply_to_message_id=reply_to_id(update),
+                **transport.upload_timeouts()
+            )
+        except Exception as e:
+            logger.error("Error sending as video: %s", e)
+            # If video fails, try sending as document
+            file.seek(0)
+            message = await transport.upload_bot.send_document(
+                chat_id=update.message.chat_id,
+                document=file,
+                caption=caption,
+                reply_to_message_id=reply_to_id(update),
+                **transport.upload_timeouts()
+            )
+
+    file_id, kind = sent_file_id(message)
+    if file_id:
+        db.save_media_file(content_hash, file_id, kind, file_size, time.monotonic() - started,
+                           canonical_key=canonical_key)
+    return content_hash
+
 async def process_video_url(update: Update, context: CallbackContext):
     """Process video download requests"""
     user = update.message.from_user
     url = update.message.text.strip()
     file_path = None
     output_dir = None
+    info_path = None
     request_id = None
 
     # Check if user has Telegram Premium
@@ -263,19 +414,28 @@ async def process_video_url(update: Update, context: CallbackContext):
         )
         return
 
+    await register_user(update, context, user, call_site="url")
+
     status_message = None
     context.user_data['downloading'] = True
     context.user_data['cancel_download'] = False
     
     async with user_semaphores[user.id]:
         try:
+            bind_log_context(user_id=user.id)
             platform = get_platform(url)
+            if short_link_resolver:
+                key = await asyncio.to_thread(canonical_key, url, short_link_resolver)
+            else:
+                key = canonical_key(url)
             request_id = db.create_download_request(
                 user.id,
                 url,
                 media_type='video',
-                platform=platform
+                platform=platform,
+                canonical_key=key
             )
+            bind_log_context(request_id=request_id, platform=platform)
             
             status_message = await update.message.reply_text(
                 MESSAGES["download_start"].format(url=url, platform=platform)
@@ -283,66 +443,96 @@ async def process_video_url(update: Update, context: CallbackContext):
             
             await update.message.chat.send_action(action=ChatAction.UPLOAD_VIDEO)
 
-            output_dir = Path(config.download_dir) / str(user.id)
-            output_dir.mkdir(parents=True, exist_ok=True)
-            
-            file_path, file_size = await asyncio.to_thread(
-                download_video,
-                url,
-                str(output_dir)
-            )
-
-            if context.user_data.get('cancel_download'):
-                raise DownloadError("Download cancelled by user")
-
-            file_path = Path(file_path)
-            if not file_path.exists():
-                raise FileNotFoundError("File not found after download")
-
-            file_size_mb = file_size / (1024 * 1024)
-            if file_size_mb > file_size_limit:
-                raise ValueError(
-                    f"⚠️ Video is too large! Maximum size is {file_size_limit}MB 📦\n"
-                    f"{'Consider getting Telegram Premium to download larger files!' if not is_premium else ''}"
-                )
-
-            await status_message.edit_text(MESSAGES["upload_progress"])
-            
-            with open(file_path, 'rb') as file:
-                try:
-                    await update.message.reply_video(
-                        video=file,
-                        caption=MESSAGES["success"].format(
-                            size=file_size_mb,
-                            platform=platform
-                        ),
-                        supports_streaming=True
-                    )
-                except Exception as e:
-                    logger.error(f"Error sending as video: {str(e)}")
-                    # If video fails, try sending as document
-                    file.seek(0)
-                    await update.message.reply_document(
-                        document=file,
-                        caption=MESSAGES["success"].format(
-                            size=file_size_mb,
-                            platform=platform
+            # Links already sent once are resent by file_id without probing or downloading
+            content_hash = None
+            media_file = db.get_media_file_by_key(key)
+            if media_file:
+                file_size = media_file["sz"]
+                if file_size / (1024 * 1024) > file_size_limit:
+                    raise too_large_error(file_size_limit, is_premium)
+                await status_message.edit_text(MESSAGES["upload_progress"])
+                caption = MESSAGES["success"].format(size=file_size / (1024 * 1024), platform=platform)
+                if await resend_media_file(update, media_file, caption, key):
+                    content_hash = media_file["_id"]
+
+            if content_hash is None:
+                # probe_video and download_video create the directory when they write to it
+                output_dir = Path(config.download_dir) / str(user.id)
+                info_path = output_dir / f"{request_id}.info.json"
+                streamed = False
+
+                # Queue behind other downloads from the same platform
+                async with platform_limiter.slot(platform):
+                    if STREAMING_ENABLED:
+                        # Hold one jar across probe and stream so the per-jar cap covers both;
+                        # formats that go to disk report their outcome from download_video
+                        jar = await asyncio.to_thread(cookie_pool.checkout, platform)
+                        try:
+                            info = await asyncio.to_thread(probe_video, url, str(info_path), jar)
+                            expected_size = info.get("filesize") or info.get("filesize_approx")
+                            if expected_size and expected_size / (1024 * 1024) > file_size_limit:
+                                raise too_large_error(file_size_limit, is_premium)
+
+                            # Single-file formats of known size go straight from yt-dlp to Telegram,
+                            # unless a file of that exact size was sent before: then the disk path
+                            # hashes it first so a repost under another URL is resent by file_id
+                            if can_stream(info) and not db.has_media_file_of_size(info["filesize"]):
+                                file_size = info["filesize"]
+                                await status_message.edit_text(MESSAGES["upload_progress"])
+                                try:
+                                    message, stream_stats = await stream_video(
+                                        context.bot,
+                                        update.message.chat_id,
+                                        info,
+                                        str(info_path),
+                                        caption=MESSAGES["success"].format(
+                                            size=file_size / (1024 * 1024),
+                                            platform=platform
+                                        ),
+                                        reply_to_message_id=reply_to_id(update),
+                                        cookies_path=str(jar.path) if jar else None,
+                                        should_cancel=lambda: context.user_data.get('cancel_download')
+                                    )
+                                    cookie_pool.report_success(jar)
+                                    streamed = True
+                                    content_hash = stream_stats.content_hash
+                                    file_id, kind = sent_file_id(message)
+                                    if file_id:
+                                        db.save_media_file(content_hash, file_id, kind, file_size, stream_stats.seconds,
+                                                           canonical_key=key)
+                                except StreamError as e:
+                                    cookie_pool.report_failure(jar, str(e))
+                                    logger.warning("Streaming failed for user %s, staging on disk: %s", user.id, e)
+                        finally:
+                            cookie_pool.checkin(jar)
+
+                    if not streamed:
+                        file_path, file_size = await asyncio.to_thread(
+                            download_video,
+                            url,
+                            str(output_dir),
+                            str(info_path) if info_path.exists() else None
                         )
-                    )
+
+                if not streamed:
+                    file_path = Path(file_path)
+                    content_hash = await upload_from_disk(update, context, file_path, file_size,
+                                           file_size_limit, is_premium, platform, status_message, key)
             
             # Update database and stats
             db.update_download_status(
                 request_id,
                 status=DownloadStatus.COMPLETED,
                 file_size=file_size,
-                download_path=str(file_path)
+                download_path=str(file_path) if file_path else None,
+                content_hash=content_hash
             )
             
             await update_user_stats(user.id, update.message.chat_id, success=True, platform=platform)
-            db.mark_video_as_sent(user.id, str(file_path))
+            db.mark_video_as_sent(user.id, content_hash)
 
         except Exception as e:
-            logger.error(f"Error for user {user.id}: {str(e)}", exc_info=True)
+            logger.error("Error for user %s: %s", user.id, e, exc_info=True)
             if status_message:
                 await status_message.edit_text(str(e) if "Video is too large" in str(e) else MESSAGES["error"])
             if request_id:
@@ -358,6 +548,8 @@ async def process_video_url(update: Update, context: CallbackContext):
             try:
                 if file_path and file_path.exists():
                     file_path.unlink()
+                if info_path and info_path.exists():
+                    info_path.unlink()
                 if output_dir and output_dir.exists() and not any(output_dir.iterdir()):
                     output_dir.rmdir()
             except Exception as e:
@@ -368,7 +560,7 @@ async def periodic_cleanup():
     while True:
         try:
             logger.info("Starting periodic data cleanup...")
-            deleted_count = db.cleanup_old_data(days_old=30)
+            deleted_count = db.cleanup_old_data(days_old=RAW_RETENTION_DAYS)
             logger.info(f"Cleanup completed. Removed {deleted_count} old records.")
             await asyncio.sleep(24 * 60 * 60)  # Wait 24 hours before next cleanup
         except Exception as e:
@@ -386,23 +578,27 @@ def schedule_cleanup(application):
     # Schedule the cleanup task
     application.job_queue.run_once(cleanup_wrapper, when=0)
 
+async def on_startup(application):
+    """Start the upload transport once the application is initialized"""
+    await transport.start_upload_bot(config.telegram_token)
+
+async def on_shutdown(application):
+    """Close upload connections"""
+    await transport.stop_upload_bot()
+
 def run_bot():
     """Initialize and run the bot"""
     # Configure logging
-    logging.basicConfig(
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        level=logging.INFO,
-        handlers=[
-            logging.FileHandler("bot.log"),
-            logging.StreamHandler()
-        ]
-    )
+    setup_logging()
 
-    # Build application
+    # Build application; control calls and uploads use separate connection pools
     application = (
         ApplicationBuilder()
         .token(config.telegram_token)
+        .request(transport.build_request("control"))
         .concurrent_updates(True)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
         .build()
     )
 
@@ -411,6 +607,7 @@ def run_bot():
     application.add_handler(CommandHandler("help", help_handle))
     application.add_handler(CommandHandler("stats", stats_handle))
     application.add_handler(CommandHandler("cancel", cancel_handle))
+    application.add_handler(CommandHandler("status", status_handle))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, process_video_url))
 
     # Schedule cleanup task
@@ -0,0 +1,161 @@
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = {
+    "si", "feature", "pp", "fbclid", "gclid", "igshid", "igsh", "mibextid",
+    "is_from_webapp", "sender_device", "sender_web_id", "is_copy_url",
+    "share_app_id", "share_item_id", "share_link_id", "tt_from", "u_code",
+    "_r", "_t", "_d", "ref", "ref_src", "ref_url", "embeds_referring_euri",
+}
+TRACKING_PREFIXES = ("utm_", "share_", "mc_")
+
+# Hosts that only redirect to a full URL and need the resolver
+SHORT_LINK_HOSTS = {"vm.tiktok.com", "vt.tiktok.com", "t.co", "pin.it", "fb.watch", "on.soundcloud.com"}
+
+YOUTUBE_HOSTS = {"youtube.com", "music.youtube.com", "youtube-nocookie.com", "youtu.be"}
+TIKTOK_HOSTS = {"tiktok.com"}
+X_HOSTS = {"x.com", "twitter.com", "fxtwitter.com", "vxtwitter.com", "fixupx.com"}
+INSTAGRAM_HOSTS = {"instagram.com", "instagr.am"}
+VIMEO_HOSTS = {"vimeo.com", "player.vimeo.com"}
+
+YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+YOUTUBE_PATH = re.compile(r"^/(?:shorts|embed|live|v|e)/([A-Za-z0-9_-]{11})")
+TIKTOK_PATH = re.compile(r"^/(?:@[^/]+/(?:video|photo)|embed(?:/v2)?|v)/(\d+)")
+X_PATH = re.compile(r"^/(?:[^/]+/status|i/web/status|i/status)/(\d+)")
+INSTAGRAM_PATH = re.compile(r"^/(?:[^/]+/)?(?:p|reels?|tv)/([A-Za-z0-9_-]+)")
+VIMEO_PATH = re.compile(r"^/(?:video/)?(\d+)")
+
+
+def _host(netloc: str) -> str:
+    host = netloc.lower().rsplit("@", 1)[-1].split(":", 1)[0]
+    for prefix in ("www.", "m.", "mobile."):
+        if host.startswith(prefix):
+            return host[len(prefix):]
+    return host
+
+
+def _youtube_id(host: str, path: str, query: dict) -> Optional[str]:
+    if host == "youtu.be":
+        video_id = path.strip("/").split("/", 1)[0]
+        return video_id if YOUTUBE_ID.match(video_id) else None
+    if path == "/watch" and YOUTUBE_ID.match(query.get("v", "")):
+        return query["v"]
+    match = YOUTUBE_PATH.match(path)
+    return match.group(1) if match else None
+
+
+def _media_id(host: str, path: str, query: dict) -> Optional[Tuple[str, str]]:
+    """Return (platform, stable media id) when a per-platform rule matches"""
+    if host in YOUTUBE_HOSTS:
+        video_id = _youtube_id(host, path, query)
+        return ("youtube", video_id) if video_id else None
+    if host in TIKTOK_HOSTS:
+        match = TIKTOK_PATH.match(path)
+        return ("tiktok", match.group(1)) if match else None
+    if host in X_HOSTS:
+        match = X_PATH.match(path)
+        return ("x", match.group(1)) if match else None
+    if host in INSTAGRAM_HOSTS:
+        match = INSTAGRAM_PATH.match(path)
+        return ("instagram", match.group(1)) if match else None
+    if host in VIMEO_HOSTS:
+        match = VIMEO_PATH.match(path)
+        return ("vimeo", match.group(1)) if match else None
+    return None
+
+
+def is_short_link(url: str) -> bool:
+    parsed = urlparse(url.strip())
+    host = _host(parsed.netloc)
+    return host in SHORT_LINK_HOSTS or (host == "tiktok.com" and parsed.path.startswith("/t/"))
+
+
+def canonicalize(url: str) -> str:
+    """Return a stable key for ``url``.
+
+    Known platforms map to ``platform:media_id``; anything else becomes the URL
+    without scheme, ``www.``/``m.`` prefixes, fragment and tracking parameters,
+    with the remaining query sorted.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    parsed = urlparse(url)
+    host = _host(parsed.netloc)
+    path = re.sub(r"/{2,}", "/", parsed.path) or "/"
+    query = dict(parse_qsl(parsed.query, keep_blank_values=True))
+
+    media = _media_id(host, path, query)
+    if media:
+        return f"{media[0]}:{media[1]}"
+
+    kept = sorted(
+        (key, value) for key, value in query.items()
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    key = host + (path.rstrip("/") or "")
+    if kept:
+        key += "?" + urlencode(kept)
+    return key
+
+
+def _follow_redirects(url: str, timeout: float) -> str:
+    request = urllib.request.Request(url, method="HEAD", headers={"User-Agent": "Mozilla/5.0"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.geturl()
+
+
+class ShortLinkResolver:
+    """Expands short links (vm.tiktok.com, t.co, ...) and caches the result.
+
+    Entries expire after ``ttl`` seconds and the cache is bounded to
+    ``max_entries`` (oldest dropped first). Failed lookups are not cached.
+    """
+
+    def __init__(self, ttl: float = 24 * 60 * 60, max_entries: int = 10000,
+                 timeout: float = 5.0, fetch: Optional[Callable[[str, float], str]] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.fetch = fetch or _follow_redirects
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, url: str) -> str:
+        if not is_short_link(url):
+            return url
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(url)
+            if cached and cached[0] > now:
+                self.hits += 1
+                self._cache.move_to_end(url)
+                return cached[1]
+            self.misses += 1
+
+        try:
+            resolved = self.fetch(url, self.timeout)
+        except Exception:
+            return url
+
+        with self._lock:
+            self._cache[url] = (now + self.ttl, resolved)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return resolved
+
+
+def canonical_key(url: str, resolver: Optional[ShortLinkResolver] = None) -> str:
+    """Canonicalize ``url``, expanding short links first when a resolver is given (blocking)"""
+    if resolver:
+        url = resolver.resolve(url)
+    return canonicalize(url)
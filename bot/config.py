@@ -28,4 +28,25 @@ channel_admin_id = config_yaml.get("channel_admin")
 admin_chat_id = config_yaml.get("admin_chat_id")
 admin_usernames = config_yaml.get("admin_usernames")
 
-download_dir = "downloads"
\ No newline at end of file
+download_dir = "downloads"
+
+# cookie jar pool, see bot/cookies.py
+cookies = config_yaml.get("cookies")
+
+# adaptive per-platform download concurrency, see bot/throttle.py
+platform_limits = config_yaml.get("platform_limits")
+
+# short link expansion for canonical URL keys, see bot/canonical.py
+short_links = config_yaml.get("short_links")
+
+# pipe yt-dlp output straight into the upload, see bot/stream.py
+streaming = config_yaml.get("streaming")
+
+# queue-based logging pipeline, see bot/logs.py
+logging_config = config_yaml.get("logging")
+
+# separate HTTP pools for control calls and uploads, see bot/transport.py
+transport = config_yaml.get("transport")
+
+# in-process cache of known users, see KnownUserCache in bot/database.py
+user_cache = config_yaml.get("user_cache")
\ No newline at end of file
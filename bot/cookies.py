@@ -0,0 +1,192 @@
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from bot import config
+
+# Substrings in yt-dlp stderr that mean the jar itself is the problem
+JAR_FAILURE_MARKERS = (
+    "http error 429",
+    "too many requests",
+    "confirm you're not a bot",
+    "confirm you’re not a bot",
+    "sign in to confirm",
+    "login required",
+    "log in for access",
+    "http error 401",
+    "http error 403",
+    "cookies are no longer valid",
+)
+
+# Used when config.yml has no "cookies" section
+DEFAULT_PLATFORM_JARS = {
+    "youtube": ["cookie.txt", "youtube/*.txt"],
+    "youtu": ["cookie.txt", "youtube/*.txt"],
+    "tiktok": ["cookietik.txt", "tiktok/*.txt"],
+}
+
+
+def is_jar_failure(stderr: str) -> bool:
+    stderr = stderr.lower()
+    return any(marker in stderr for marker in JAR_FAILURE_MARKERS)
+
+
+class CookieJar:
+    def __init__(self, path: Path):
+        self.path = path
+        self.in_use = 0
+        self.last_used = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.benched_until = 0.0
+
+    def is_benched(self, now: float) -> bool:
+        return self.benched_until > now
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            "jar": self.path.name,
+            "in_use": self.in_use,
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "benched_for": max(0, int(self.benched_until - now)),
+            "last_used": self.last_used,
+        }
+
+
+class CookiePool:
+    """Per-platform pool of cookie jars handed out least-recently-used first.
+
+    Each jar serves at most ``max_per_jar`` downloads at once. A jar that fails
+    with an auth/throttle error is benched, doubling the bench time on each
+    consecutive failure up to ``max_bench_seconds``.
+    """
+
+    def __init__(self, cookies_dir: Path, platform_jars: Dict[str, List[str]],
+                 max_per_jar: int = 2, bench_seconds: int = 300,
+                 max_bench_seconds: int = 3600, wait_timeout: int = 120):
+        self.max_per_jar = max_per_jar
+        self.bench_seconds = bench_seconds
+        self.max_bench_seconds = max_bench_seconds
+        self.wait_timeout = wait_timeout
+        self._cond = threading.Condition()
+        self._jars: Dict[str, List[CookieJar]] = {}
+
+        # Jars are shared between platforms that list the same file (youtu/youtube)
+        jars_by_path: Dict[Path, CookieJar] = {}
+        for platform, patterns in platform_jars.items():
+            jars = []
+            for pattern in patterns:
+                for path in sorted(cookies_dir.glob(pattern)):
+                    if path.is_file():
+                        jar = jars_by_path.setdefault(path, CookieJar(path))
+                        if jar not in jars:
+                            jars.append(jar)
+            self._jars[platform] = jars
+
+    def has_jars(self, platform: str) -> bool:
+        return bool(self._jars.get(platform))
+
+    def _pick(self, platform: str, now: float) -> Optional[CookieJar]:
+        candidates = [
+            jar for jar in self._jars.get(platform, [])
+            if not jar.is_benched(now) and jar.in_use < self.max_per_jar
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda jar: jar.last_used)
+
+    def _all_benched(self, platform: str, now: float) -> bool:
+        return all(jar.is_benched(now) for jar in self._jars.get(platform, []))
+
+    def checkout(self, platform: str) -> Optional[CookieJar]:
+        """Take a jar for ``platform``, or None when the platform has no usable jar.
+
+        Blocks while every healthy jar is at its concurrency cap. Every jar
+        taken must be handed back with ``checkin``; prefer ``acquire``.
+        """
+        if not self.has_jars(platform):
+            return None
+
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                jar = self._pick(platform, now)
+                if jar or self._all_benched(platform, now):
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if jar:
+                jar.in_use += 1
+                jar.last_used = now
+        return jar
+
+    def checkin(self, jar: Optional[CookieJar]):
+        if not jar:
+            return
+        with self._cond:
+            jar.in_use -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def acquire(self, platform: str) -> Iterator[Optional[CookieJar]]:
+        """Yield a jar for ``platform`` or None when the platform has no usable jar.
+
+        Blocks while every healthy jar is at its concurrency cap. Callers report
+        the outcome with ``report_success``/``report_failure`` before exiting.
+        """
+        jar = self.checkout(platform)
+        try:
+            yield jar
+        finally:
+            self.checkin(jar)
+
+    def report_success(self, jar: Optional[CookieJar]):
+        if not jar:
+            return
+        with self._cond:
+            jar.successes += 1
+            jar.consecutive_failures = 0
+
+    def report_failure(self, jar: Optional[CookieJar], stderr: str):
+        """Record a failed download; bench the jar if the error points at it."""
+        if not jar or not is_jar_failure(stderr):
+            return
+        with self._cond:
+            jar.failures += 1
+            jar.consecutive_failures += 1
+            bench = min(
+                self.bench_seconds * 2 ** (jar.consecutive_failures - 1),
+                self.max_bench_seconds
+            )
+            jar.benched_until = time.time() + bench
+
+    def stats(self) -> Dict[str, List[Dict]]:
+        """Health snapshot of every jar, grouped by platform"""
+        now = time.time()
+        with self._cond:
+            return {
+                platform: [jar.to_dict(now) for jar in jars]
+                for platform, jars in self._jars.items()
+            }
+
+
+def build_cookie_pool() -> CookiePool:
+    cookies_config = config.cookies or {}
+    return CookiePool(
+        Path(cookies_config.get("dir", "cookies")),
+        cookies_config.get("platforms") or DEFAULT_PLATFORM_JARS,
+        max_per_jar=cookies_config.get("max_per_jar", 2),
+        bench_seconds=cookies_config.get("bench_seconds", 300),
+        max_bench_seconds=cookies_config.get("max_bench_seconds", 3600),
+        wait_timeout=cookies_config.get("wait_timeout", 120),
+    )
+
+
+cookie_pool = build_cookie_pool()
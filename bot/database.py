@@ -1,6 +1,8 @@
-from typing import Optional, Any, List, Dict
+from typing import Optional, Any, List, Dict, Tuple
+from collections import OrderedDict
+import time
 import pymongo
-import uuid
+from bson import ObjectId
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 import logging
@@ -14,6 +16,154 @@ class DownloadStatus(Enum):
     FAILED = "failed"
     SENT = "sent"
 
+# Schema version 2 stores download requests with short field names and an
+# ObjectId _id (its timestamp doubles as created_at). Fields that would be
+# null are left out and media_type is only stored when it isn't "video".
+SCHEMA_VERSION = 2
+REQUEST_FIELDS = {
+    "user_id": "u",
+    "url": "url",
+    "canonical_key": "k",
+    "media_type": "mt",
+    "platform": "p",
+    "status": "s",
+    "completed_at": "ca",
+    "sent_at": "sa",
+    "error_message": "e",
+    "file_size": "sz",
+    "download_path": "dp",
+    "attempts": "a",
+    "last_attempt": "la",
+    "content_hash": "h",
+}
+DEFAULT_MEDIA_TYPE = "video"
+
+# user_stats keeps one bucket per user per month, _id "<user_id>:<YYYYMM>",
+# with per-day counters under d.<DD> and month totals under t.
+STAT_FIELDS = {
+    "daily_requests": "r",
+    "successful_requests": "ok",
+    "failed_requests": "f",
+    "total_data_downloaded": "b",
+}
+
+
+def stats_bucket_id(user_id: int, day: datetime) -> str:
+    return f"{user_id}:{day:%Y%m}"
+
+
+def stat_field(stat_name: str) -> str:
+    """Map a long stat name to its bucket key ("youtube_downloads" -> "p.youtube")"""
+    if stat_name in STAT_FIELDS:
+        return STAT_FIELDS[stat_name]
+    if stat_name.endswith("_downloads"):
+        return f"p.{stat_name[:-len('_downloads')]}"
+    return stat_name
+
+
+def expand_request(doc: Optional[Dict]) -> Optional[Dict]:
+    """Return a v2 download request with the long field names used by callers"""
+    if doc is None:
+        return None
+    short_to_long = {short: long for long, short in REQUEST_FIELDS.items()}
+    expanded = {short_to_long.get(key, key): value for key, value in doc.items()}
+    expanded.setdefault("media_type", DEFAULT_MEDIA_TYPE)
+    if isinstance(doc.get("_id"), ObjectId):
+        expanded["created_at"] = doc["_id"].generation_time
+    return expanded
+
+
+def day_stats(bucket: Optional[Dict], day: datetime) -> Dict:
+    """Return one day's counters from a monthly bucket with long stat names"""
+    counters = ((bucket or {}).get("d") or {}).get(f"{day:%d}", {})
+    long_names = {short: long for long, short in STAT_FIELDS.items()}
+    stats = {long_names.get(key, key): value for key, value in counters.items() if key not in ("p", "mg")}
+    for platform, count in counters.get("p", {}).items():
+        stats[f"{platform}_downloads"] = count
+    return stats
+
+
+# Days of raw download requests/stats kept by cleanup_old_data
+RAW_RETENTION_DAYS = 30
+
+# platform_daily holds one rollup per platform per day, _id "<platform>:<YYYYMMDD>",
+# fed from the request pipeline and never removed by cleanup_old_data.
+ROLLUP_FIELDS = {
+    "requests": "r",
+    "completed": "ok",
+    "failed": "f",
+    "bytes": "b",
+    "latency_ms": "lat",
+    "latency_count": "n_lat",
+}
+
+
+def rollup_id(platform: str, day: datetime) -> str:
+    return f"{platform}:{day:%Y%m%d}"
+
+
+# Mongo calls registration cost before the cache, by call site. /start ran
+# count_documents for a known user and count_documents twice plus the user and
+# stats inserts for a new one; URL messages made no registration calls (their
+# last_interaction rode along with the stats update)
+LEGACY_REGISTER_CALLS = {
+    "start": {"existing": 1, "new": 4},
+    "url": {"existing": 0, "new": 0},
+}
+
+
+class KnownUserCache:
+    """Bounded LRU of user ids known to exist, with when we last wrote last_interaction.
+
+    Lets ``Database.touch_user`` skip Mongo entirely for known users whose
+    last_interaction was written less than ``touch_interval`` seconds ago.
+    """
+
+    def __init__(self, max_size: int = 100000, touch_interval: float = 300.0):
+        self.max_size = max_size
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+        self.legacy_calls = 0
+        self._touched: "OrderedDict[int, float]" = OrderedDict()
+
+    def is_fresh(self, user_id: int) -> bool:
+        touched = self._touched.get(user_id)
+        if touched is None or time.monotonic() - touched >= self.touch_interval:
+            self.misses += 1
+            return False
+        self.hits += 1
+        self._touched.move_to_end(user_id)
+        return True
+
+    def add(self, user_id: int):
+        self._touched[user_id] = time.monotonic()
+        self._touched.move_to_end(user_id)
+        while len(self._touched) > self.max_size:
+            self._touched.popitem(last=False)
+
+    def discard(self, user_id: int):
+        self._touched.pop(user_id, None)
+
+    def record_calls(self, calls: int, legacy_calls: int):
+        """Count Mongo calls one registration made and what the uncached path would have made"""
+        self.calls += calls
+        self.legacy_calls += legacy_calls
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._touched),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "calls_per_request": self.calls / lookups if lookups else 0.0,
+            "legacy_calls_per_request": self.legacy_calls / lookups if lookups else 0.0,
+            "calls_saved_per_request": (self.legacy_calls - self.calls) / lookups if lookups else 0.0,
+        }
+
+
 class Database:
     def __init__(self):
         """Initialize database connection and collections"""
@@ -24,12 +174,19 @@ class Database:
             w='majority'
         )
         self.db = self.client["Social_Media"]
+        user_cache_config = config.user_cache or {}
+        self.known_users = KnownUserCache(
+            max_size=user_cache_config.get("max_size", 100000),
+            touch_interval=user_cache_config.get("touch_interval", 300)
+        )
         
         # Initialize collections
         self.user_collection = self.db["user"]
         self.download_request_collection = self.db["download_requests"]
         self.user_stats_collection = self.db["user_stats"]
         self.sent_videos_collection = self.db["sent_videos"]
+        self.platform_daily_collection = self.db["platform_daily"]
+        self.media_files_collection = self.db["media_files"]
         
         # Set up indexes
         self.create_indexes()
@@ -40,280 +197,442 @@ class Database:
         self.user_collection.create_index([("user_id", 1)], unique=True)
         self.user_collection.create_index("chat_id")
         
-        # Download request indexes
-        self.download_request_collection.create_index("user_id")
-        self.download_request_collection.create_index("status")
-        self.download_request_collection.create_index("created_at")
-        
-        # User stats indexes
-        self.user_stats_collection.create_index([("user_id", 1), ("date", 1)], unique=True)
+        # Download request indexes (_id already orders by creation time)
+        self.download_request_collection.create_index([("u", 1), ("s", 1)])
+        self.download_request_collection.create_index("k", sparse=True)
+
+        # User stats buckets are addressed by _id and need no extra index;
+        # "m" lets cleanup find old months. The v1 unique (user_id, date) index
+        # would reject a second bucket (both null), so drop it up front.
+        if "user_id_1_date_1" in self.user_stats_collection.index_information():
+            self.user_stats_collection.drop_index("user_id_1_date_1")
+        self.user_stats_collection.create_index("m")
         
         # Sent videos indexes
-        self.sent_videos_collection.create_index([("user_id", 1), ("file_path", 1)], unique=True)
+        # Sent videos are keyed by content hash; file paths were unique per download
+        if "user_id_1_file_path_1" in self.sent_videos_collection.index_information():
+            self.sent_videos_collection.drop_index("user_id_1_file_path_1")
+        self.sent_videos_collection.create_index(
+            [("user_id", 1), ("h", 1)],
+            unique=True,
+            partialFilterExpression={"h": {"$exists": True}}
+        )
         self.sent_videos_collection.create_index("sent_at")
 
+        # Media files are keyed by content hash (_id) and list the canonical URLs
+        # ("k") that produced them; "sz" finds hash candidates before streaming
+        # and "lu" lets cleanup find unused ones
+        self.media_files_collection.create_index("k")
+        self.media_files_collection.create_index("sz")
+        self.media_files_collection.create_index("lu")
+
+        # Platform rollup indexes
+        self.platform_daily_collection.create_index("d")
+
     def check_if_user_exists(self, user_id: int) -> bool:
         """Check if user exists in database"""
         return self.user_collection.count_documents({"user_id": user_id}) > 0
 
     def add_new_user(self, user_id: int, chat_id: int, username: str = "", 
-                     first_name: str = "", last_name: str = ""):
-        """Add new user to database with initial stats"""
-        if not self.check_if_user_exists(user_id):
-            current_time = datetime.now(timezone.utc)
-            today_start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            # Create user document
-            user_dict = {
-                "user_id": user_id,
-                "chat_id": chat_id,
-                "username": username,
-                "first_name": first_name,
-                "last_name": last_name,
-                "last_interaction": current_time,
-                "first_seen": current_time,
-                "is_banned": False,
-                "ban_reason": "",
-                "total_requests": 0,
-                "successful_downloads": 0,
-                "failed_downloads": 0
-            }
-            
-            # Create initial user stats
-            stats_dict = {
-                "user_id": user_id,
-                "date": today_start,
-                "daily_requests": 0,
-                "successful_requests": 0,
-                "failed_requests": 0,
-                "total_data_downloaded": 0
-            }
-            
-            self.user_collection.insert_one(user_dict)
-            self.user_stats_collection.insert_one(stats_dict)
+                     first_name: str = "", last_name: str = "") -> bool:
+        """Create the user if missing and refresh last_interaction, in one idempotent upsert.
+
+        Stats need no initial document: the monthly bucket is upserted on first $inc.
+        Returns True if the user was created.
+        """
+        current_time = datetime.now(timezone.utc)
+        result = self.user_collection.update_one(
+            {"user_id": user_id},
+            {
+                "$set": {
+                    "chat_id": chat_id,
+                    "last_interaction": current_time
+                },
+                "$setOnInsert": {
+                    "username": username,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "first_seen": current_time,
+                    "is_banned": False,
+                    "ban_reason": "",
+                    "total_requests": 0,
+                    "successful_downloads": 0,
+                    "failed_downloads": 0
+                }
+            },
+            upsert=True
+        )
+        self.known_users.add(user_id)
+        return result.upserted_id is not None
+
+    def touch_user(self, user_id: int, chat_id: int, username: str = "",
+                   first_name: str = "", last_name: str = "",
+                   call_site: str = "start") -> bool:
+        """Make sure the user exists, writing at most once per touch interval.
+
+        ``call_site`` ("start" or "url") picks the uncached cost the calls made
+        here are compared against. Returns True if Mongo was written, False if
+        the cache answered.
+        """
+        legacy_calls = LEGACY_REGISTER_CALLS[call_site]
+        if self.known_users.is_fresh(user_id):
+            self.known_users.record_calls(0, legacy_calls["existing"])
+            return False
+        created = self.add_new_user(user_id, chat_id, username, first_name, last_name)
+        self.known_users.record_calls(1, legacy_calls["new" if created else "existing"])
+        return True
 
     def create_download_request(self, user_id: int, url: str, 
-                              media_type: str, platform: str) -> str:
+                              media_type: str, platform: str,
+                              canonical_key: Optional[str] = None) -> str:
         """Create new download request and return request ID"""
-        current_time = datetime.now(timezone.utc)
-        request_id = str(uuid.uuid4())
+        request_id = ObjectId()
         request_dict = {
             "_id": request_id,
-            "user_id": user_id,
+            "v": SCHEMA_VERSION,
+            "u": user_id,
             "url": url,
-            "media_type": media_type,
-            "platform": platform,
-            "status": DownloadStatus.PENDING.value,
-            "created_at": current_time,
-            "completed_at": None,
-            "error_message": None,
-            "file_size": None,
-            "download_path": None,
-            "attempts": 0,
-            "last_attempt": current_time
+            "p": platform,
+            "s": DownloadStatus.PENDING.value,
+            "a": 0,
+            "la": request_id.generation_time
         }
+        if canonical_key:
+            request_dict["k"] = canonical_key
+        if media_type != DEFAULT_MEDIA_TYPE:
+            request_dict["mt"] = media_type
         
         self.download_request_collection.insert_one(request_dict)
         self.update_daily_stats(user_id, "daily_requests")
-        return request_id
+        self.update_platform_rollup(platform, request_id.generation_time, {"requests": 1})
+        return str(request_id)
+
+    def get_download_request(self, request_id: str) -> Optional[Dict]:
+        """Get download request with long field names"""
+        return expand_request(
+            self.download_request_collection.find_one({"_id": ObjectId(request_id)})
+        )
 
     def update_download_status(self, request_id: str, status: DownloadStatus,
                              error_message: Optional[str] = None,
                              file_size: Optional[int] = None,
-                             download_path: Optional[str] = None):
+                             download_path: Optional[str] = None,
+                             content_hash: Optional[str] = None):
         """Update download request status and related statistics"""
         try:
             current_time = datetime.now(timezone.utc)
             update_dict = {
-                "status": status.value,
-                "last_attempt": current_time
+                "s": status.value,
+                "la": current_time
             }
 
-            request = self.download_request_collection.find_one({"_id": request_id})
+            if status == DownloadStatus.COMPLETED:
+                update_dict["ca"] = current_time
+                if file_size is not None:
+                    update_dict["sz"] = file_size
+                if download_path:
+                    update_dict["dp"] = download_path
+                if content_hash:
+                    update_dict["h"] = content_hash
+            elif status == DownloadStatus.FAILED:
+                if error_message:
+                    update_dict["e"] = error_message
+            elif status == DownloadStatus.SENT:
+                update_dict["sa"] = current_time
+
+            # Update and fetch the owner in one round-trip
+            request = self.download_request_collection.find_one_and_update(
+                {"_id": ObjectId(request_id)},
+                {
+                    "$set": update_dict,
+                    "$inc": {"a": 1}
+                },
+                projection={"u": 1, "p": 1}
+            )
             if not request:
                 raise ValueError(f"Request {request_id} not found")
+            user_id = request["u"]
+            created_at = request["_id"].generation_time
 
             if status == DownloadStatus.COMPLETED:
-                update_dict.update({
-                    "completed_at": current_time,
-                    "file_size": file_size,
-                    "download_path": download_path
-                })
-                self.increment_user_stat(request["user_id"], "successful_downloads")
-                self.update_daily_stats(request["user_id"], "successful_requests")
+                self.increment_user_stat(user_id, "successful_downloads")
+                self.update_daily_stats(user_id, "successful_requests")
                 if file_size:
-                    self.update_user_data_downloaded(request["user_id"], file_size)
+                    self.update_user_data_downloaded(user_id, file_size)
+                self.update_platform_rollup(request["p"], created_at, {
+                    "completed": 1,
+                    "bytes": file_size or 0,
+                    "latency_ms": int((current_time - created_at).total_seconds() * 1000),
+                    "latency_count": 1
+                })
 
             elif status == DownloadStatus.FAILED:
-                update_dict["error_message"] = error_message
-                self.increment_user_stat(request["user_id"], "failed_downloads")
-                self.update_daily_stats(request["user_id"], "failed_requests")
+                self.increment_user_stat(user_id, "failed_downloads")
+                self.update_daily_stats(user_id, "failed_requests")
+                self.update_platform_rollup(request["p"], created_at, {"failed": 1})
 
             elif status == DownloadStatus.SENT:
-                update_dict["sent_at"] = current_time
-                if download_path:
-                    self.mark_video_as_sent(request["user_id"], download_path)
-
-            self.download_request_collection.update_one(
-                {"_id": request_id},
-                {
-                    "$set": update_dict,
-                    "$inc": {"attempts": 1}
-                }
-            )
+                if content_hash:
+                    self.mark_video_as_sent(user_id, content_hash)
         except Exception as e:
-            logger.error(f"Error updating download status: {str(e)}")
+            logger.error("Error updating download status: %s", e)
             raise
 
-    def mark_video_as_sent(self, user_id: int, file_path: str):
-        """Mark video as sent to user"""
+    def mark_video_as_sent(self, user_id: int, content_hash: str):
+        """Mark video (by content hash) as sent to user"""
         try:
             self.sent_videos_collection.insert_one({
                 "user_id": user_id,
-                "file_path": file_path,
+                "h": content_hash,
                 "sent_at": datetime.now(timezone.utc)
             })
         except pymongo.errors.DuplicateKeyError:
             pass
 
-    def is_video_sent(self, user_id: int, file_path: str) -> bool:
-        """Check if video was already sent to user"""
+    def is_video_sent(self, user_id: int, content_hash: str) -> bool:
+        """Check if video (by content hash) was already sent to user"""
         return self.sent_videos_collection.find_one({
             "user_id": user_id,
-            "file_path": file_path
+            "h": content_hash
         }) is not None
 
+    def get_media_file(self, content_hash: str) -> Optional[Dict]:
+        """Get the Telegram file already uploaded for these bytes, if any"""
+        return self.media_files_collection.find_one({"_id": content_hash})
+
+    def get_media_file_by_key(self, canonical_key: str) -> Optional[Dict]:
+        """Get the Telegram file already uploaded for this canonical URL, if any"""
+        return self.media_files_collection.find_one({"k": canonical_key})
+
+    def has_media_file_of_size(self, file_size: int) -> bool:
+        """True if some uploaded file has exactly this size, so the bytes may be a repost"""
+        return self.media_files_collection.find_one({"sz": file_size}, {"_id": 1}) is not None
+
+    def save_media_file(self, content_hash: str, file_id: str, kind: str,
+                        file_size: int, upload_seconds: float,
+                        canonical_key: Optional[str] = None):
+        """Remember the Telegram file_id of an uploaded file by its content hash"""
+        current_time = datetime.now(timezone.utc)
+        update = {
+            "$set": {
+                "fid": file_id,
+                "kind": kind,
+                "sz": file_size,
+                "us": upload_seconds,
+                "lu": current_time
+            },
+            "$setOnInsert": {"c": current_time}
+        }
+        if canonical_key:
+            update["$addToSet"] = {"k": canonical_key}
+        self.media_files_collection.update_one({"_id": content_hash}, update, upsert=True)
+
+    def record_media_reuse(self, content_hash: str, saved_bytes: int, saved_seconds: float,
+                           canonical_key: Optional[str] = None):
+        """Count a resend by file_id and what it saved compared to uploading again"""
+        update = {
+            "$inc": {"n": 1, "saved_b": saved_bytes, "saved_s": saved_seconds},
+            "$set": {"lu": datetime.now(timezone.utc)}
+        }
+        if canonical_key:
+            update["$addToSet"] = {"k": canonical_key}
+        self.media_files_collection.update_one({"_id": content_hash}, update)
+
+    def get_dedupe_stats(self) -> Dict:
+        """Totals of resends by file_id, bytes and upload seconds they saved"""
+        totals = list(self.media_files_collection.aggregate([
+            {"$match": {"n": {"$gt": 0}}},
+            {"$group": {
+                "_id": None,
+                "reused": {"$sum": "$n"},
+                "saved_bytes": {"$sum": "$saved_b"},
+                "saved_seconds": {"$sum": "$saved_s"}
+            }}
+        ]))
+        stats = totals[0] if totals else {"reused": 0, "saved_bytes": 0, "saved_seconds": 0}
+        stats.pop("_id", None)
+        stats["files"] = self.media_files_collection.estimated_document_count()
+        return stats
+
+    def update_platform_rollup(self, platform: str, day: datetime, increments: Dict[str, int]):
+        """Add to the platform x day rollup that ``day`` (request creation time) falls in"""
+        try:
+            self.platform_daily_collection.update_one(
+                {"_id": rollup_id(platform, day)},
+                {
+                    "$inc": {ROLLUP_FIELDS[name]: value for name, value in increments.items()},
+                    "$setOnInsert": {
+                        "p": platform,
+                        "d": day.replace(hour=0, minute=0, second=0, microsecond=0)
+                    }
+                },
+                upsert=True
+            )
+        except Exception as e:
+            # Analytics must never fail a download
+            logger.error("Error updating platform rollup: %s", e)
+
+    def rebuild_platform_rollups(self, since: datetime, until: datetime,
+                                 retention_days: int = RAW_RETENTION_DAYS) -> Tuple[datetime, datetime]:
+        """Recompute rollups for whole days in [since, until) from raw download requests.
+
+        Existing rollups for those days are replaced, so ``since`` is moved up to
+        the first day cleanup_old_data hasn't started deleting, and the rebuild
+        is refused while unmigrated v1 requests remain in the range. Returns the
+        range actually rebuilt.
+        """
+        oldest_complete_day = (
+            datetime.now(timezone.utc) - timedelta(days=retention_days)
+        ).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        if since < oldest_complete_day:
+            logger.warning(
+                f"Rollup rebuild starts at {oldest_complete_day:%Y-%m-%d}, "
+                f"earlier days are partly cleaned up"
+            )
+            since = oldest_complete_day
+        if since >= until:
+            return since, until
+
+        unmigrated = self.download_request_collection.count_documents({
+            "v": {"$exists": False},
+            "created_at": {"$gte": since, "$lt": until}
+        }, limit=1)
+        if unmigrated:
+            raise ValueError(
+                "Unmigrated v1 download requests in range, run scripts/migrate_schema_v2.py first"
+            )
+
+        completed = [DownloadStatus.COMPLETED.value, DownloadStatus.SENT.value]
+        self.download_request_collection.aggregate([
+            {"$match": {
+                "v": SCHEMA_VERSION,
+                "_id": {"$gte": ObjectId.from_datetime(since), "$lt": ObjectId.from_datetime(until)}
+            }},
+            {"$group": {
+                "_id": {
+                    "p": "$p",
+                    "d": {"$dateTrunc": {"date": {"$toDate": "$_id"}, "unit": "day"}}
+                },
+                "r": {"$sum": 1},
+                "ok": {"$sum": {"$cond": [{"$in": ["$s", completed]}, 1, 0]}},
+                "f": {"$sum": {"$cond": [{"$eq": ["$s", DownloadStatus.FAILED.value]}, 1, 0]}},
+                "b": {"$sum": {"$ifNull": ["$sz", 0]}},
+                "lat": {"$sum": {"$cond": [
+                    {"$ifNull": ["$ca", False]},
+                    {"$subtract": ["$ca", {"$toDate": "$_id"}]},
+                    0
+                ]}},
+                "n_lat": {"$sum": {"$cond": [{"$ifNull": ["$ca", False]}, 1, 0]}}
+            }},
+            {"$project": {
+                "_id": {"$concat": [
+                    "$_id.p", ":", {"$dateToString": {"date": "$_id.d", "format": "%Y%m%d"}}
+                ]},
+                "p": "$_id.p",
+                "d": "$_id.d",
+                "r": 1, "ok": 1, "f": 1, "b": 1, "lat": 1, "n_lat": 1
+            }},
+            {"$merge": {
+                "into": "platform_daily",
+                "on": "_id",
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ])
+        return since, until
+
+    def get_platform_rollups(self, since: datetime, platform: Optional[str] = None) -> List[Dict]:
+        """Get platform x day rollups from ``since`` with long field names"""
+        query = {"d": {"$gte": since}}
+        if platform:
+            query["p"] = platform
+        long_names = {short: long for long, short in ROLLUP_FIELDS.items()}
+        return [
+            {
+                "platform": doc["p"],
+                "date": doc["d"],
+                **{long_names[key]: doc.get(key, 0) for key in long_names}
+            }
+            for doc in self.platform_daily_collection.find(query).sort("d", 1)
+        ]
+
     def get_user_load(self, user_id: int) -> Dict:
         """Get user's current load statistics"""
         current_time = datetime.now(timezone.utc)
         
         return {
             "pending_downloads": self.download_request_collection.count_documents({
-                "user_id": user_id,
-                "status": DownloadStatus.PENDING.value
+                "u": user_id,
+                "s": DownloadStatus.PENDING.value
             }),
             "recent_requests": self.download_request_collection.count_documents({
-                "user_id": user_id,
-                "created_at": {"$gt": current_time - timedelta(minutes=1)}
+                "u": user_id,
+                "_id": {"$gt": ObjectId.from_datetime(current_time - timedelta(minutes=1))}
             })
         }
 
     def update_daily_stats(self, user_id: int, stat_name: str, increment: int = 1):
         """Update user's daily statistics"""
         try:
-            current_time = datetime.now(timezone.utc)
-            today_start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-            
-            # Create initial stats document if it doesn't exist
-            default_stats = {
-                "user_id": user_id,
-                "date": today_start,  # Using datetime object instead of date
-                "daily_requests": 0,
-                "successful_requests": 0,
-                "failed_requests": 0,
-                "total_data_downloaded": 0
-            }
-
-            # First try to update existing document
-            result = self.user_stats_collection.update_one(
-                {
-                    "user_id": user_id,
-                    "date": today_start  # Using datetime object
-                },
-                {
-                    "$inc": {stat_name: increment}
-                }
-            )
-
-            # If no document was updated, insert new one
-            if result.modified_count == 0:
-                try:
-                    self.user_stats_collection.insert_one(default_stats)
-                    # Try increment again after insert
-                    self.user_stats_collection.update_one(
-                        {
-                            "user_id": user_id,
-                            "date": today_start
-                        },
-                        {
-                            "$inc": {stat_name: increment}
-                        }
-                    )
-                except pymongo.errors.DuplicateKeyError:
-                    # Another process might have created the document
-                    self.user_stats_collection.update_one(
-                        {
-                            "user_id": user_id,
-                            "date": today_start
-                        },
-                        {
-                            "$inc": {stat_name: increment}
-                        }
-                    )
-
+            self.increment_daily_stats(user_id, {stat_name: increment})
         except Exception as e:
-            logger.error(f"Error updating daily stats: {str(e)}")
+            logger.error("Error updating daily stats: %s", e)
             raise
 
-    async def update_user_stats(user_id: int, chat_id: int, success: bool = True, platform: str = None):
-        """Update user statistics"""
-        try:
-            current_time = datetime.now(timezone.utc)
-            
-            # Update user's main stats
-            update_dict = {
-                "last_interaction": current_time,
-                f"total_{platform}_downloads": 1 if success else 0
-            } if platform else {"last_interaction": current_time}
-            
-            inc_dict = {
-                "total_requests": 1,
-                "successful_downloads": 1 if success else 0,
-                "failed_downloads": 0 if success else 1
-            }
+    def increment_daily_stats(self, user_id: int, increments: Dict[str, int],
+                              last_request: Optional[datetime] = None):
+        """Add to today's counters (and the month totals) with a single upsert"""
+        current_time = datetime.now(timezone.utc)
+        month_start = current_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        day = f"{current_time:%d}"
 
-            db.user_collection.update_one(
-                {"user_id": user_id},
-                {
-                    "$set": update_dict,
-                    "$inc": inc_dict
-                }
-            )
+        inc_dict = {}
+        for stat_name, increment in increments.items():
+            field = stat_field(stat_name)
+            inc_dict[f"d.{day}.{field}"] = increment
+            inc_dict[f"t.{field}"] = increment
 
-            # Update daily stats using datetime instead of date
-            today_start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-            daily_stats = {
-                "daily_requests": 1,
-                "successful_requests": 1 if success else 0,
-                "failed_requests": 0 if success else 1
-            }
-            if platform:
-                daily_stats[f"{platform}_downloads"] = 1 if success else 0
+        update = {
+            "$inc": inc_dict,
+            "$setOnInsert": {"u": user_id, "m": month_start}
+        }
+        if last_request:
+            update["$set"] = {"lr": last_request}
 
-            db.user_stats_collection.update_one(
-                {
-                    "user_id": user_id,
-                    "date": today_start
-                },
-                {
-                    "$inc": daily_stats,
-                    "$set": {"last_request_date": current_time}
-                },
-                upsert=True
-            )
+        self.user_stats_collection.update_one(
+            {"_id": stats_bucket_id(user_id, current_time)},
+            update,
+            upsert=True
+        )
 
-        except Exception as e:
-            logger.error(f"Error updating user stats: {str(e)}", exc_info=True)
+    def get_today_stats(self, user_id: int) -> Dict:
+        """Get today's counters with long stat names"""
+        current_time = datetime.now(timezone.utc)
+        bucket = self.user_stats_collection.find_one(
+            {"_id": stats_bucket_id(user_id, current_time)},
+            projection={f"d.{current_time:%d}": 1}
+        )
+        return day_stats(bucket, current_time)
 
-    def cleanup_old_data(self, days_old: int = 30) -> int:
+    def get_total_data_downloaded(self, user_id: int) -> int:
+        """Sum downloaded bytes over the user's monthly buckets"""
+        return sum(
+            bucket.get("t", {}).get(STAT_FIELDS["total_data_downloaded"], 0)
+            for bucket in self.user_stats_collection.find(
+                {"_id": {"$regex": f"^{user_id}:"}},
+                projection={"t.b": 1}
+            )
+        )
+
+    def cleanup_old_data(self, days_old: int = RAW_RETENTION_DAYS) -> int:
         """Clean up old data from all collections"""
         try:
             cutoff_date = datetime.now(timezone.utc) - timedelta(days=days_old)
             
             # Remove old completed/failed/sent downloads
             delete_result = self.download_request_collection.delete_many({
-                "created_at": {"$lt": cutoff_date},
-                "status": {
+                "_id": {"$lt": ObjectId.from_datetime(cutoff_date)},
+                "s": {
                     "$in": [
                         DownloadStatus.COMPLETED.value,
                         DownloadStatus.FAILED.value,
@@ -326,10 +645,16 @@ class Database:
             self.sent_videos_collection.delete_many({
                 "sent_at": {"$lt": cutoff_date}
             })
+
+            # Forget uploaded files nobody has sent again since the cutoff
+            self.media_files_collection.delete_many({
+                "lu": {"$lt": cutoff_date}
+            })
             
-            # Remove old user stats
+            # Remove user stats buckets whose whole month is older than the cutoff
+            cutoff_month = cutoff_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
             self.user_stats_collection.delete_many({
-                "date": {"$lt": cutoff_date}
+                "m": {"$lt": cutoff_month}
             })
 
             return delete_result.deleted_count
@@ -347,15 +672,4 @@ class Database:
 
     def update_user_data_downloaded(self, user_id: int, bytes_downloaded: int):
         """Update user's total downloaded data amount"""
-        current_time = datetime.now(timezone.utc)
-        today_start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        self.user_stats_collection.update_one(
-            {
-                "user_id": user_id,
-                "date": today_start
-            },
-            {
-                "$inc": {"total_data_downloaded": bytes_downloaded}
-            }
-        )
\ No newline at end of file
+        self.increment_daily_stats(user_id, {"total_data_downloaded": bytes_downloaded})
@@ -1,11 +1,16 @@
 import os
+import json
+import hashlib
+import logging
 import subprocess
 import time
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 from pathlib import Path
 from urllib.parse import urlparse
 from bot import config
+from bot.cookies import CookieJar, cookie_pool
 
+logger = logging.getLogger(__name__)
 valid_domains = config.domains["valid_domains"]
 
 class DownloadError(Exception):
@@ -18,7 +23,39 @@ def get_platform(url: str) -> str:
             return valid_domain
     raise DownloadError(f"Unsupported platform: {domain}")
 
-def download_video(url: str, output_dir: str) -> Tuple[str, int]:
+def probe_video(url: str, info_path: str, jar: Optional[CookieJar] = None) -> Dict:
+    """Extract metadata for the format download_video would pick, without downloading.
+
+    The info JSON is written to ``info_path`` so the download can reuse it with
+    --load-info-json instead of extracting again. ``jar`` stays checked out by
+    the caller, who also runs the download with it and reports the outcome;
+    only a failed probe is reported here.
+    """
+    cmd = [
+        "yt-dlp",
+        url,
+        "-f", "best",
+        "--dump-single-json",
+        "--no-warnings",
+        "--no-playlist"
+    ]
+    if jar:
+        cmd.extend(["--cookies", str(jar.path)])
+
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    if result.returncode != 0:
+        cookie_pool.report_failure(jar, result.stderr)
+        raise DownloadError(f"Download failed: {result.stderr.strip()}")
+
+    # The per-user directory may have been removed by another request's cleanup
+    # while this one waited for a slot and a jar
+    info_path = Path(info_path)
+    info_path.parent.mkdir(parents=True, exist_ok=True)
+    info_path.write_text(result.stdout)
+    return json.loads(result.stdout)
+
+def download_video(url: str, output_dir: str, info_path: Optional[str] = None) -> Tuple[str, int]:
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
@@ -31,7 +68,7 @@ def download_video(url: str, output_dir: str) -> Tuple[str, int]:
         
         cmd = [
             "yt-dlp",
-            url,
+            *(["--load-info-json", info_path] if info_path else [url]),
             "-f", "best",
             "-o", output_path_template,
             "--no-warnings",
@@ -39,18 +76,23 @@ def download_video(url: str, output_dir: str) -> Tuple[str, int]:
             "--merge-output-format", "mp4"  # Force MP4 output
         ]
 
-        if platform in ['youtube', 'youtu']:
-            cmd.extend(["--cookies", "cookies/cookie.txt"])
+        with cookie_pool.acquire(platform) as jar:
+            if jar:
+                cmd.extend(["--cookies", str(jar.path)])
 
-        print(f"Debug: Running command: {' '.join(cmd)}")
-        
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        
-        if result.returncode != 0:
-            raise DownloadError(f"Download failed: {result.stderr.strip()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Running command: %s", " ".join(cmd))
+
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+            if result.returncode != 0:
+                cookie_pool.report_failure(jar, result.stderr)
+                raise DownloadError(f"Download failed: {result.stderr.strip()}")
+            cookie_pool.report_success(jar)
 
         all_files = list(output_dir.glob(f"{filename_prefix}.*"))
-        print("Debug: Files in output directory after download:", [f.name for f in all_files])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Files in output directory after download: %s", [f.name for f in all_files])
 
         if not all_files:
             raise DownloadError("Download completed but file not found.")
@@ -58,7 +100,7 @@ def download_video(url: str, output_dir: str) -> Tuple[str, int]:
         downloaded_file = all_files[0]
         file_size = downloaded_file.stat().st_size
 
-        print(f"Debug: Download completed successfully: {downloaded_file}, Size: {file_size} bytes")
+        logger.debug("Download completed successfully: %s, Size: %d bytes", downloaded_file, file_size)
         return str(downloaded_file), file_size
 
     except Exception as e:
@@ -66,11 +108,19 @@ def download_video(url: str, output_dir: str) -> Tuple[str, int]:
         for f in output_dir.glob(f"{filename_prefix}.*"):
             try:
                 f.unlink()
-                print(f"Debug: Removed partially downloaded file: {f.name}")
+                logger.debug("Removed partially downloaded file: %s", f.name)
             except OSError as cleanup_error:
-                print(f"Debug: Error cleaning up file {f}: {cleanup_error}")
+                logger.warning("Error cleaning up file %s: %s", f, cleanup_error)
         raise DownloadError(f"Download failed: {str(e)}")
 
+def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks so large videos never sit in memory"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def is_valid_url(url: str) -> bool:
     try:
         result = urlparse(url)
@@ -0,0 +1,140 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+from bot import config
+
+# Per-request fields attached to every record logged from the same task/thread
+CONTEXT_FIELDS = ("request_id", "user_id", "platform")
+_log_context = ContextVar("log_context", default={})
+
+_listener: Optional[QueueListener] = None
+
+
+def bind_log_context(**fields):
+    """Attach fields (request_id, user_id, platform) to records from the current task.
+
+    Each PTB update runs in its own task and asyncio.to_thread copies the
+    context, so values never leak between concurrent requests.
+    """
+    _log_context.set({**_log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class RepeatFilter(logging.Filter):
+    """Let through at most ``burst`` identical warnings/errors per ``window`` seconds.
+
+    Records are identical when they come from the same source line with the
+    same exception type and message template (``record.msg`` before %-args are
+    applied), so different failures logged by one handler are counted
+    separately while per-user or per-video details in the args are not. Hot
+    paths must log with %-args for this to work. The next record let through
+    after a dropped run carries the number of dropped records as ``suppressed``.
+    """
+
+    def __init__(self, burst: int = 5, window: float = 60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._seen: Dict[Tuple, list] = {}  # key -> [window start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.pathname, record.lineno, exc_type, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] > self.window:
+                suppressed = entry[2] if entry else 0
+                self._seen[key] = [now, 1, 0]
+                if len(self._seen) > 10000:
+                    self._seen = {k: v for k, v in self._seen.items() if now - v[0] <= self.window}
+            elif entry[1] < self.burst:
+                entry[1] += 1
+                suppressed = 0
+            else:
+                entry[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting (and tracebacks) to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """Route all logging through a queue drained by a background writer thread"""
+    global _listener
+    if _listener:
+        return
+
+    logging_config = config.logging_config or {}
+    level = getattr(logging, str(logging_config.get("level", "INFO")).upper(), logging.INFO)
+
+    file_handler = RotatingFileHandler(
+        logging_config.get("file", "bot.log"),
+        maxBytes=logging_config.get("max_bytes", 10 * 1024 * 1024),
+        backupCount=logging_config.get("backup_count", 5),
+        encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter())
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = BackgroundQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(RepeatFilter(
+        burst=logging_config.get("repeat_burst", 5),
+        window=logging_config.get("repeat_window", 60)
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+    # httpx logs every Bot API call at INFO
+    logging.getLogger("httpx").setLevel(max(level, logging.WARNING))
+
+    _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import logging
+import resource
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+import httpx
+from telegram import Bot, Message
+from bot import config, transport
+from bot.download import DownloadError
+
+logger = logging.getLogger(__name__)
+
+stream_config = config.streaming or {}
+STREAMING_ENABLED = stream_config.get("enabled", True)
+CHUNK_SIZE = stream_config.get("chunk_size", 256 * 1024)
+
+# Formats yt-dlp can write to stdout byte-for-byte, with a size we can announce
+STREAMABLE_PROTOCOLS = {"http", "https"}
+
+PAGE_SIZE_KB = resource.getpagesize() // 1024
+
+
+class StreamError(DownloadError):
+    """The streamed upload did not deliver a message.
+
+    Raised when yt-dlp's output ends short or overruns the announced size, when
+    the HTTP request fails, or when Telegram rejects or garbles the response.
+    Nothing reached the chat, so the caller can stage the file on disk instead.
+    """
+    pass
+
+
+def current_rss_kb() -> int:
+    """Resident set size of the bot process right now (0 where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE_KB
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class StreamStats:
+    """Timing and memory of one streamed upload.
+
+    ``peak_rss_growth_kb`` is the highest process RSS sampled on each chunk,
+    minus the RSS when the stream started. Other requests running at the same
+    time add to it, so it is an upper bound on what this stream held.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_byte_seconds: Optional[float] = None
+        self.seconds = 0.0
+        self.bytes = 0
+        self.peak_rss_growth_kb = 0
+        self.content_hash: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "first_byte_seconds": self.first_byte_seconds,
+            "seconds": self.seconds,
+            "bytes": self.bytes,
+            "peak_rss_growth_kb": self.peak_rss_growth_kb,
+        }
+
+
+def can_stream(info: Dict) -> bool:
+    """True when the picked format is a single file of known size needing no merge/transcode"""
+    return (
+        not info.get("requested_formats")
+        and isinstance(info.get("filesize"), int)
+        and info.get("protocol") in STREAMABLE_PROTOCOLS
+    )
+
+
+def _multipart(fields: Dict[str, str], file_field: str, filename: str,
+               content_type: str) -> Tuple[str, bytes, bytes]:
+    """Return (boundary, everything before the file bytes, everything after)"""
+    boundary = uuid.uuid4().hex
+    head = b""
+    for name, value in fields.items():
+        head += (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n"
+        ).encode()
+    head += (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    return boundary, head, tail
+
+
+async def stream_video(bot: Bot, chat_id: int, info: Dict, info_path: str,
+                       caption: str, reply_to_message_id: Optional[int] = None,
+                       cookies_path: Optional[str] = None,
+                       should_cancel: Callable[[], bool] = lambda: False) -> Tuple[Message, StreamStats]:
+    """Pipe yt-dlp's stdout straight into a sendVideo/sendDocument multipart upload.
+
+    Bytes are read in CHUNK_SIZE pieces only when the HTTP client asks for the
+    next one, so the OS pipe gives yt-dlp backpressure and memory stays bounded.
+    The request goes through the upload bot's client, so streamed and on-disk
+    sends share the upload pool's connection limit.
+    """
+    expected_size = info["filesize"]
+    is_mp4 = info.get("ext") == "mp4"
+    method, file_field = ("sendVideo", "video") if is_mp4 else ("sendDocument", "document")
+
+    fields = {"chat_id": str(chat_id), "caption": caption}
+    if is_mp4:
+        fields["supports_streaming"] = "true"
+    if reply_to_message_id:
+        fields["reply_to_message_id"] = str(reply_to_message_id)
+    boundary, head, tail = _multipart(
+        fields, file_field, f"video.{info.get('ext', 'mp4')}",
+        "video/mp4" if is_mp4 else "application/octet-stream"
+    )
+
+    cmd = ["yt-dlp", "--load-info-json", info_path, "-f", "best", "-o", "-", "--no-warnings", "--quiet"]
+    if cookies_path:
+        cmd.extend(["--cookies", cookies_path])
+
+    stats = StreamStats()
+    digest = hashlib.sha256()
+    rss_before = current_rss_kb()
+    process = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stderr_task = asyncio.create_task(process.stderr.read())
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        while True:
+            if should_cancel():
+                raise DownloadError("Download cancelled by user")
+            chunk = await process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if stats.first_byte_seconds is None:
+                stats.first_byte_seconds = time.monotonic() - stats.started
+            stats.bytes += len(chunk)
+            stats.peak_rss_growth_kb = max(stats.peak_rss_growth_kb, current_rss_kb() - rss_before)
+            digest.update(chunk)
+            if stats.bytes > expected_size:
+                raise StreamError("yt-dlp produced more bytes than announced")
+            yield chunk
+        if stats.bytes != expected_size:
+            await process.wait()
+            stderr = (await stderr_task).decode(errors="replace").strip()
+            raise StreamError(f"Stream ended after {stats.bytes}/{expected_size} bytes: {stderr}")
+        yield tail
+
+    try:
+        response = await transport.upload_client().post(
+            f"{bot.base_url}/{method}",
+            content=body(),
+            headers={
+                "Content-Type": f"multipart/form-data; boundary={boundary}",
+                "Content-Length": str(len(head) + expected_size + len(tail))
+            }
+        )
+        data = response.json()
+        if not data.get("ok"):
+            raise StreamError(f"Telegram rejected streamed upload: {data.get('description')}")
+    except httpx.HTTPError as e:
+        raise StreamError(f"Streamed upload failed: {str(e)}")
+    except ValueError:
+        raise StreamError(f"Streamed upload got a non-JSON response (HTTP {response.status_code})")
+    finally:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        if not stderr_task.done():
+            stderr_task.cancel()
+
+    stats.seconds = time.monotonic() - stats.started
+    stats.content_hash = digest.hexdigest()
+    logger.info(
+        f"Streamed {stats.bytes} bytes in {stats.seconds:.1f}s "
+        f"(first byte uploaded after {stats.first_byte_seconds or 0:.2f}s, "
+        f"peak RSS +{stats.peak_rss_growth_kb} KB)"
+    )
+    return Message.de_json(data["result"], bot), stats
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+from bot import config
+
+# Substrings in download errors that mean the platform is pushing back on us
+THROTTLE_MARKERS = (
+    "http error 429",
+    "too many requests",
+    "rate limit",
+    "rate-limit",
+    "timed out",
+    "timeout",
+    "http error 503",
+    "temporarily unavailable",
+)
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in THROTTLE_MARKERS)
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for one platform.
+
+    Every success raises the limit by ``increase / limit`` (about +``increase``
+    per full window of jobs); a throttle or timeout multiplies it by
+    ``decrease_factor``. Decreases are applied at most once per ``cooldown``
+    seconds so a burst of failures from the same window only halves it once.
+    """
+
+    def __init__(self, min_limit: int, max_limit: int, initial: int,
+                 increase: float = 1.0, decrease_factor: float = 0.5,
+                 cooldown: float = 5.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.waiting = 0
+        self.successes = 0
+        self.throttled = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    async def acquire(self):
+        async with self._cond:
+            self.waiting += 1
+            try:
+                await self._cond.wait_for(lambda: self.in_flight < self.current)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False, success: bool = True):
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            elif success:
+                self.successes += 1
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._cond.notify_all()
+
+    def to_dict(self) -> Dict:
+        return {
+            "limit": self.current,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "successes": self.successes,
+            "throttled": self.throttled,
+        }
+
+
+class PlatformLimiter:
+    """Keeps one AdaptiveLimit per platform (as returned by ``get_platform``)"""
+
+    def __init__(self, limits_config: Dict):
+        self.defaults = {
+            "min_limit": limits_config.get("min", 1),
+            "max_limit": limits_config.get("max", 16),
+            "initial": limits_config.get("initial", 4),
+            "increase": limits_config.get("increase", 1.0),
+            "decrease_factor": limits_config.get("decrease_factor", 0.5),
+            "cooldown": limits_config.get("cooldown", 5.0),
+        }
+        self.overrides = limits_config.get("platforms") or {}
+        self._limits: Dict[str, AdaptiveLimit] = {}
+
+    def get(self, platform: str) -> AdaptiveLimit:
+        if platform not in self._limits:
+            # Created lazily so the asyncio.Condition binds to the running loop
+            settings = dict(self.defaults)
+            for key, value in (self.overrides.get(platform) or {}).items():
+                settings[{"min": "min_limit", "max": "max_limit"}.get(key, key)] = value
+            self._limits[platform] = AdaptiveLimit(**settings)
+        return self._limits[platform]
+
+    @asynccontextmanager
+    async def slot(self, platform: str) -> AsyncIterator[AdaptiveLimit]:
+        """Wait for a free slot on ``platform`` and feed the outcome back into its limit"""
+        limit = self.get(platform)
+        await limit.acquire()
+        try:
+            yield limit
+        except asyncio.CancelledError:
+            await limit.release(success=False)
+            raise
+        except Exception as e:
+            await limit.release(throttled=is_throttle_error(e), success=False)
+            raise
+        else:
+            await limit.release()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {platform: limit.to_dict() for platform, limit in self._limits.items()}
+
+
+platform_limiter = PlatformLimiter(config.platform_limits or {})
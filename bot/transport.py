@@ -0,0 +1,108 @@
+from typing import Dict, Optional
+import httpx
+from telegram.ext import ExtBot
+from telegram.request import HTTPXRequest
+from bot import config
+
+# "control" carries edits, chat actions and file_id resends; "upload" carries
+# multipart sends of downloaded files so they can't starve the control pool.
+DEFAULT_TRANSPORTS = {
+    "control": {
+        "pool_size": 32,
+        "connect_timeout": 5.0,
+        "read_timeout": 10.0,
+        "write_timeout": 10.0,
+        "pool_timeout": 3.0,
+        "keepalive_expiry": 30.0,
+        "http_version": "2",
+    },
+    "upload": {
+        "pool_size": 8,
+        "connect_timeout": 10.0,
+        "read_timeout": 300.0,
+        "write_timeout": 600.0,
+        "pool_timeout": 120.0,
+        "keepalive_expiry": 60.0,
+        "http_version": "2",
+    },
+}
+
+upload_bot: Optional[ExtBot] = None
+
+
+def transport_settings(name: str) -> Dict:
+    settings = dict(DEFAULT_TRANSPORTS[name])
+    settings.update((config.transport or {}).get(name) or {})
+    return settings
+
+
+def httpx_limits(settings: Dict) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings["pool_size"],
+        max_keepalive_connections=settings["pool_size"],
+        keepalive_expiry=settings["keepalive_expiry"]
+    )
+
+
+def httpx_timeout(settings: Dict) -> httpx.Timeout:
+    return httpx.Timeout(
+        connect=settings["connect_timeout"],
+        read=settings["read_timeout"],
+        write=settings["write_timeout"],
+        pool=settings["pool_timeout"]
+    )
+
+
+def upload_timeouts() -> Dict[str, float]:
+    """Timeout kwargs for send_video/send_document on the upload bot.
+
+    PTB 20.1 gives file sends write_timeout=20 by default, which overrides the
+    request's own timeouts, so uploads must pass them explicitly.
+    """
+    settings = transport_settings("upload")
+    return {
+        name: settings[name]
+        for name in ("connect_timeout", "read_timeout", "write_timeout", "pool_timeout")
+    }
+
+
+class KeepAliveHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest with a configurable keep-alive expiry (fixed at 5s in PTB 20.1)"""
+
+    def __init__(self, settings: Dict):
+        super().__init__(
+            connection_pool_size=settings["pool_size"],
+            connect_timeout=settings["connect_timeout"],
+            read_timeout=settings["read_timeout"],
+            write_timeout=settings["write_timeout"],
+            pool_timeout=settings["pool_timeout"],
+            http_version=str(settings["http_version"])
+        )
+        self._client_kwargs["limits"] = httpx_limits(settings)
+        self._client = self._build_client()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled httpx client; raw requests made with it share this pool"""
+        return self._client
+
+
+def build_request(name: str) -> HTTPXRequest:
+    return KeepAliveHTTPXRequest(transport_settings(name))
+
+
+def upload_client() -> httpx.AsyncClient:
+    """httpx client behind upload_bot, so streamed sends count against the upload pool"""
+    return upload_bot.request.client
+
+
+async def start_upload_bot(token: str):
+    """Create the Bot used for file uploads; call from Application.post_init"""
+    global upload_bot
+    upload_bot = ExtBot(token, request=build_request("upload"))
+    await upload_bot.initialize()
+
+
+async def stop_upload_bot():
+    if upload_bot:
+        await upload_bot.shutdown()
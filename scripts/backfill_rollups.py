@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Rebuild platform_daily rollups from raw download_requests.
+
+New requests feed the rollups as they happen; run this once after deploying to
+backfill the days still fully held in download_requests. The oldest day is
+skipped because cleanup has already deleted part of it, and the run refuses to
+start while unmigrated v1 requests remain (run migrate_schema_v2.py first).
+Today is skipped by default because live updates are still landing on it.
+
+Usage: python3 scripts/backfill_rollups.py [--days 29] [--include-today]
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from bot.database import Database, RAW_RETENTION_DAYS  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=RAW_RETENTION_DAYS - 1)
+    parser.add_argument("--include-today", action="store_true")
+    args = parser.parse_args()
+
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    since = today - timedelta(days=args.days)
+    until = today + timedelta(days=1) if args.include_today else today
+
+    db = Database()
+    try:
+        since, until = db.rebuild_platform_rollups(since, until)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Rebuilt rollups for {since:%Y-%m-%d} .. {until - timedelta(days=1):%Y-%m-%d}: "
+          f"{db.platform_daily_collection.count_documents({'d': {'$gte': since, '$lt': until}})} platform-days")
+
+
+if __name__ == "__main__":
+    main()
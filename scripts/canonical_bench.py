@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Check bot/canonical.py against a URL corpus and time key lookups.
+
+Usage: python3 scripts/canonical_bench.py [iterations]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from bot.canonical import canonicalize, canonical_key, ShortLinkResolver  # noqa: E402
+
+# (raw url as users send it, expected canonical key)
+CORPUS = [
+    ("https://youtu.be/dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://youtu.be/dQw4w9WgXcQ?si=AbCdEf123&t=42", "youtube:dQw4w9WgXcQ"),
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://youtube.com/watch?v=dQw4w9WgXcQ&si=xyz&feature=share", "youtube:dQw4w9WgXcQ"),
+    ("https://m.youtube.com/watch?feature=youtu.be&v=dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://m.youtube.com/shorts/dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://www.youtube.com/shorts/dQw4w9WgXcQ?feature=share", "youtube:dQw4w9WgXcQ"),
+    ("https://www.youtube.com/embed/dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://www.youtube.com/live/dQw4w9WgXcQ?si=abc", "youtube:dQw4w9WgXcQ"),
+    ("https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RDAMVM", "youtube:dQw4w9WgXcQ"),
+    ("https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("youtube.com/watch?v=dQw4w9WgXcQ", "youtube:dQw4w9WgXcQ"),
+    ("https://www.tiktok.com/@someone/video/7301234567890123456", "tiktok:7301234567890123456"),
+    ("https://www.tiktok.com/@someone/video/7301234567890123456?is_from_webapp=1&sender_device=pc",
+     "tiktok:7301234567890123456"),
+    ("https://www.tiktok.com/@someone/video/7301234567890123456?_r=1&_t=8hXyZ&u_code=abc",
+     "tiktok:7301234567890123456"),
+    ("https://m.tiktok.com/v/7301234567890123456.html", "tiktok:7301234567890123456"),
+    ("https://www.tiktok.com/embed/v2/7301234567890123456", "tiktok:7301234567890123456"),
+    ("https://x.com/someone/status/1712345678901234567", "x:1712345678901234567"),
+    ("https://twitter.com/someone/status/1712345678901234567?s=20&t=abc", "x:1712345678901234567"),
+    ("https://mobile.twitter.com/someone/status/1712345678901234567", "x:1712345678901234567"),
+    ("https://vxtwitter.com/someone/status/1712345678901234567", "x:1712345678901234567"),
+    ("https://x.com/i/web/status/1712345678901234567", "x:1712345678901234567"),
+    ("https://www.instagram.com/reel/Cx1AbCdEfGh/?igsh=MTIzNDU=", "instagram:Cx1AbCdEfGh"),
+    ("https://instagram.com/p/Cx1AbCdEfGh/?utm_source=ig_web_copy_link", "instagram:Cx1AbCdEfGh"),
+    ("https://www.instagram.com/someone/reel/Cx1AbCdEfGh/", "instagram:Cx1AbCdEfGh"),
+    ("https://vimeo.com/76979871", "vimeo:76979871"),
+    ("https://player.vimeo.com/video/76979871?h=abc", "vimeo:76979871"),
+    ("https://www.dailymotion.com/video/x8abcd?utm_source=tw&utm_medium=social",
+     "dailymotion.com/video/x8abcd"),
+    ("https://www.bilibili.com/video/BV1xx411c7mD/?p=2&share_source=copy_web",
+     "bilibili.com/video/BV1xx411c7mD?p=2"),
+    ("https://soundcloud.com/artist/track#t=1:00", "soundcloud.com/artist/track"),
+]
+
+# Short links and what the resolver would expand them to
+SHORT_LINKS = {
+    "https://vm.tiktok.com/ZMabcdEf/":
+        "https://www.tiktok.com/@someone/video/7301234567890123456?_r=1",
+    "https://www.tiktok.com/t/ZT8abcdEf/":
+        "https://www.tiktok.com/@someone/video/7301234567890123456",
+    "https://t.co/AbCdEf1234": "https://x.com/someone/status/1712345678901234567",
+}
+
+
+def check_corpus() -> int:
+    failures = 0
+    for raw, expected in CORPUS:
+        got = canonicalize(raw)
+        if got != expected:
+            failures += 1
+            print(f"FAIL {raw}\n     expected {expected}\n     got      {got}")
+
+    resolver = ShortLinkResolver(fetch=lambda url, timeout: SHORT_LINKS[url])
+    for short, full in SHORT_LINKS.items():
+        expected = canonicalize(full)
+        got = canonical_key(short, resolver)
+        if got != expected:
+            failures += 1
+            print(f"FAIL {short}\n     expected {expected}\n     got      {got}")
+
+    print(f"corpus: {len(CORPUS) + len(SHORT_LINKS) - failures}/{len(CORPUS) + len(SHORT_LINKS)} ok")
+    return failures
+
+
+def bench(iterations: int):
+    urls = [raw for raw, _ in CORPUS]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for url in urls:
+            canonicalize(url)
+    elapsed = time.perf_counter() - start
+    calls = iterations * len(urls)
+    print(f"canonicalize: {calls} calls, {elapsed * 1e6 / calls:.2f} us/call")
+
+    resolver = ShortLinkResolver(fetch=lambda url, timeout: SHORT_LINKS[url])
+    shorts = list(SHORT_LINKS)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for url in shorts:
+            canonical_key(url, resolver)
+    elapsed = time.perf_counter() - start
+    calls = iterations * len(shorts)
+    print(f"canonical_key (cached short links): {calls} calls, {elapsed * 1e6 / calls:.2f} us/call, "
+          f"hit rate {resolver.hits / (resolver.hits + resolver.misses):.1%}")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    failed = check_corpus()
+    bench(iterations)
+    sys.exit(1 if failed else 0)
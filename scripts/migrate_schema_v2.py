@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Online migration of download_requests and user_stats to schema version 2.
+
+The bot can keep running: new code only reads and writes v2 documents, and old
+documents are rewritten in batches then deleted. Re-running after an
+interruption is safe (converted request _ids are derived from the old uuid and
+migrated stat days are flagged, so nothing is counted twice).
+
+Usage: python3 scripts/migrate_schema_v2.py [--batch-size 1000] [--pause 0.1] [--keep-old-indexes]
+"""
+import argparse
+import calendar
+import hashlib
+import struct
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+import pymongo  # noqa: E402
+from bson import ObjectId  # noqa: E402
+from bot.database import (  # noqa: E402
+    Database, SCHEMA_VERSION, REQUEST_FIELDS, DEFAULT_MEDIA_TYPE,
+    stats_bucket_id, stat_field
+)
+
+OLD_REQUEST_INDEXES = ["user_id_1", "status_1", "created_at_1", "canonical_key_1"]
+
+
+def collection_report(db, name: str) -> dict:
+    stats = db.command("collStats", name)
+    return {
+        "count": stats.get("count", 0),
+        "size": stats.get("size", 0),
+        "avgObjSize": stats.get("avgObjSize", 0),
+        "storageSize": stats.get("storageSize", 0),
+        "totalIndexSize": stats.get("totalIndexSize", 0),
+        "indexSizes": stats.get("indexSizes", {}),
+    }
+
+
+def print_report(before: dict, after: dict):
+    def mb(value):
+        return f"{value / (1024 * 1024):.2f} MB"
+
+    for name in before:
+        print(f"\n{name}")
+        print(f"  {'':16}{'before':>14}{'after':>14}")
+        for key in ["count", "avgObjSize", "size", "storageSize", "totalIndexSize"]:
+            old, new = before[name][key], after[name][key]
+            if key in ("size", "storageSize", "totalIndexSize"):
+                old, new = mb(old), mb(new)
+            print(f"  {key:16}{old:>14}{new:>14}")
+        for index in sorted(set(before[name]["indexSizes"]) | set(after[name]["indexSizes"])):
+            old = before[name]["indexSizes"].get(index)
+            new = after[name]["indexSizes"].get(index)
+            old = mb(old) if old is not None else "-"
+            new = mb(new) if new is not None else "-"
+            print(f"  {index:16}{old:>14}{new:>14}")
+    print("\nstorageSize only shrinks after WiredTiger reuses or compacts the freed pages "
+          "(db.runCommand({compact: ...}) on each node).")
+
+
+def object_id_for(old_doc: dict) -> ObjectId:
+    """Deterministic ObjectId: created_at timestamp + 8 bytes of the old _id hash"""
+    created_at = old_doc.get("created_at")
+    # pymongo hands back naive UTC datetimes; .timestamp() would read them as local time
+    timestamp = calendar.timegm(created_at.utctimetuple()) if created_at else int(time.time())
+    digest = hashlib.sha1(str(old_doc["_id"]).encode()).digest()[:8]
+    return ObjectId(struct.pack(">I", timestamp) + digest)
+
+
+def convert_request(old_doc: dict) -> dict:
+    new_doc = {"_id": object_id_for(old_doc), "v": SCHEMA_VERSION}
+    for long_name, short_name in REQUEST_FIELDS.items():
+        value = old_doc.get(long_name)
+        if value is None:
+            continue
+        if long_name == "media_type" and value == DEFAULT_MEDIA_TYPE:
+            continue
+        new_doc[short_name] = value
+    return new_doc
+
+
+def migrate_requests(collection, batch_size: int, pause: float) -> int:
+    migrated = 0
+    while True:
+        batch = list(collection.find({"v": {"$exists": False}}).limit(batch_size))
+        if not batch:
+            return migrated
+        try:
+            collection.insert_many([convert_request(doc) for doc in batch], ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            # Duplicates are rows converted by an interrupted earlier run
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+        collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        migrated += len(batch)
+        print(f"download_requests: {migrated} migrated", end="\r")
+        time.sleep(pause)
+
+
+def stats_update(old_doc: dict) -> pymongo.UpdateOne:
+    date = old_doc["date"]
+    day = f"{date:%d}"
+    inc_dict = {}
+    for key, value in old_doc.items():
+        if key in ("_id", "user_id", "date", "last_request_date") or not isinstance(value, (int, float)):
+            continue
+        field = stat_field(key)
+        inc_dict[f"d.{day}.{field}"] = inc_dict.get(f"d.{day}.{field}", 0) + value
+        inc_dict[f"t.{field}"] = inc_dict.get(f"t.{field}", 0) + value
+
+    update = {
+        "$inc": inc_dict,
+        "$set": {f"d.{day}.mg": 1},
+        "$setOnInsert": {
+            "u": old_doc["user_id"],
+            "m": date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        }
+    }
+    if old_doc.get("last_request_date"):
+        update["$max"] = {"lr": old_doc["last_request_date"]}
+    # The mg flag makes the update a no-op (duplicate key on upsert) if already applied
+    return pymongo.UpdateOne(
+        {"_id": stats_bucket_id(old_doc["user_id"], date), f"d.{day}.mg": {"$ne": 1}},
+        update,
+        upsert=True
+    )
+
+
+def migrate_stats(collection, batch_size: int, pause: float) -> int:
+    migrated = 0
+    while True:
+        batch = list(collection.find({"date": {"$exists": True}}).limit(batch_size))
+        if not batch:
+            return migrated
+        try:
+            collection.bulk_write([stats_update(doc) for doc in batch], ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+        collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        migrated += len(batch)
+        print(f"user_stats: {migrated} migrated", end="\r")
+        time.sleep(pause)
+
+
+def drop_indexes(collection, names):
+    existing = collection.index_information()
+    for name in names:
+        if name in existing:
+            collection.drop_index(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.1, help="seconds to sleep between batches")
+    parser.add_argument("--keep-old-indexes", action="store_true")
+    args = parser.parse_args()
+
+    db = Database()
+    collections = {
+        "download_requests": db.download_request_collection,
+        "user_stats": db.user_stats_collection,
+    }
+    before = {name: collection_report(db.db, name) for name in collections}
+
+    print(f"\ndownload_requests: {migrate_requests(db.download_request_collection, args.batch_size, args.pause)} migrated")
+    print(f"user_stats: {migrate_stats(db.user_stats_collection, args.batch_size, args.pause)} migrated")
+
+    if not args.keep_old_indexes:
+        drop_indexes(db.download_request_collection, OLD_REQUEST_INDEXES)
+
+    after = {name: collection_report(db.db, name) for name in collections}
+    print_report(before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Edit latency while large uploads are in flight: one shared pool vs split pools.
+
+Starts a local fake Bot API server that reads upload bodies at a capped
+bandwidth per connection, then fires concurrent sendVideo uploads while
+timing editMessageText calls every --edit-interval seconds. Both scenarios
+use PTB bots built by bot.transport; the split one takes its pool sizes and
+timeouts from the transport section of config.yml.
+
+Usage: python3 scripts/transport_bench.py [--uploads 16] [--upload-mb 20] [--bandwidth-mb 10]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from telegram import Bot
+from telegram.error import TimedOut
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from bot import transport  # noqa: E402
+
+
+async def fake_bot_api(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, bandwidth: float):
+    """Minimal keep-alive HTTP/1.1 server answering every Bot API method with ok"""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode().split("\r\n")
+            method = lines[0].split(" ")[1].rsplit("/", 1)[-1]
+            headers = {k.lower(): v.strip() for k, v in (l.split(":", 1) for l in lines[1:] if ":" in l)}
+            remaining = int(headers.get("content-length", 0))
+            chunk = 64 * 1024
+            while remaining:
+                data = await reader.read(min(chunk, remaining))
+                if not data:
+                    return
+                remaining -= len(data)
+                if method in ("sendVideo", "sendDocument"):
+                    await asyncio.sleep(len(data) / bandwidth)
+            body = json.dumps({"ok": True, "result": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}}}).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+def bench_bot(base: str, request) -> Bot:
+    return Bot("TOKEN", base_url=base, request=request)
+
+
+async def upload(bot: Bot, payload: bytes):
+    await bot.send_video(chat_id=1, video=payload, filename="video.mp4", **transport.upload_timeouts())
+
+
+async def edit_loop(bot: Bot, stop: asyncio.Event, interval: float) -> List[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await bot.edit_message_text("📤", chat_id=1, message_id=1)
+            latencies.append(time.perf_counter() - started)
+        except TimedOut:
+            latencies.append(float("inf"))
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def scenario(name: str, upload_bot: Bot, control_bot: Bot, args, payload: bytes):
+    stop = asyncio.Event()
+    edits = asyncio.create_task(edit_loop(control_bot, stop, args.edit_interval))
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(upload_bot, payload) for _ in range(args.uploads)))
+    upload_seconds = time.perf_counter() - started
+    stop.set()
+    latencies = await edits
+    finite = sorted(l for l in latencies if l != float("inf"))
+    timeouts = len(latencies) - len(finite)
+    p = lambda q: finite[min(len(finite) - 1, int(q * len(finite)))] * 1000 if finite else float("nan")
+    print(f"{name:8} uploads {upload_seconds:6.1f}s | edits n={len(latencies):4} "
+          f"p50={p(0.5):8.1f}ms p95={p(0.95):8.1f}ms max={p(1.0):8.1f}ms timeouts={timeouts}"
+          + (f" mean={statistics.mean(finite) * 1000:.1f}ms" if finite else ""))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=16)
+    parser.add_argument("--upload-mb", type=float, default=20)
+    parser.add_argument("--bandwidth-mb", type=float, default=10, help="server read rate per upload connection")
+    parser.add_argument("--shared-pool", type=int, default=8, help="pool size of the single shared client")
+    parser.add_argument("--edit-interval", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = await asyncio.start_server(
+        lambda r, w: fake_bot_api(r, w, args.bandwidth_mb * 1024 * 1024), "127.0.0.1", 0
+    )
+    port = server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}/bot"
+    payload = os.urandom(int(args.upload_mb * 1024 * 1024))
+
+    # The fake server only speaks HTTP/1.1; before the split every call went
+    # through one request sized for uploads
+    settings = {
+        name: {**transport.transport_settings(name), "http_version": "1.1"}
+        for name in ("control", "upload")
+    }
+    shared = transport.KeepAliveHTTPXRequest({**settings["upload"], "pool_size": args.shared_pool})
+    uploads = transport.KeepAliveHTTPXRequest(settings["upload"])
+    control = transport.KeepAliveHTTPXRequest(settings["control"])
+
+    async with server:
+        try:
+            shared_bot = bench_bot(base, shared)
+            await scenario("shared", shared_bot, shared_bot, args, payload)
+            await scenario("split", bench_bot(base, uploads), bench_bot(base, control), args, payload)
+        finally:
+            for request in (shared, uploads, control):
+                await request.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())